@@ -1,7 +1,9 @@
 """The Indicator Camera Component."""
 
+import asyncio
 import logging
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
 from typing import Optional
 
 import indicam_client
@@ -12,20 +14,35 @@ from homeassistant.exceptions import ConfigEntryAuthFailed, ConfigEntryError
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
-from .const import INDICAM_URL, CONF_CLIENT_API_KEY, CONF_PATH_OUT, DOMAIN
+from .const import (
+    INDICAM_URL,
+    CONF_CLIENT_API_KEY,
+    CONF_PATH_OUT,
+    CONNECT_OK_CACHE_SECONDS,
+    CONNECT_TIMEOUT,
+    MAX_CONCURRENT_MEASUREMENTS,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
+# When each API key last passed a connection test (monotonic time), so entry reloads and repeated config flow
+# submissions can skip the round-trip.
+_connect_ok_cache: dict[str, float] = {}
+
 # The type of the integration data stored in the config entry
 type IndiCamConfigEntry = ConfigEntry[IndiCamComponentState]
 
 
-@dataclass
+@dataclass(slots=True)
 class IndiCamComponentState:
     """A class holding component configuration and state variables"""
     api_key: str
     api_client: indicam_client.IndiCamServiceClient
     out_path: Optional[str]
+    # Bounds the image measurements in flight at the service, shared by all sensors using the client
+    measurement_limiter: asyncio.Semaphore = field(
+        default_factory=lambda: asyncio.Semaphore(MAX_CONCURRENT_MEASUREMENTS)
+    )
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
@@ -49,17 +66,30 @@ async def create_client(hass: HomeAssistant, client_auth_key: str) -> indicam_cl
     """ Creates an async http client to the IndiCam service, and tests the connection."""
     session = async_get_clientsession(hass)
     client = indicam_client.IndiCamServiceClient(session, INDICAM_URL, client_auth_key)
-    await test_client_connect(client)
+    await test_client_connect(client, client_auth_key)
     return client
 
 
-async def test_client_connect(client: indicam_client.IndiCamServiceClient):
-    """ Test the connection to the service with a client. """
-    connect_status = await client.test_connect()
+async def test_client_connect(client: indicam_client.IndiCamServiceClient, api_key: str):
+    """ Test the connection to the service with a client.
+
+        A key that passed the test within the last CONNECT_OK_CACHE_SECONDS is trusted without re-testing. The
+        test is bounded by CONNECT_TIMEOUT, and timing out is treated as a connection failure.
+    """
+    tested_at = _connect_ok_cache.get(api_key)
+    if tested_at is not None and time.monotonic() - tested_at < CONNECT_OK_CACHE_SECONDS:
+        return
+    try:
+        async with asyncio.timeout(CONNECT_TIMEOUT):
+            connect_status = await client.test_connect()
+    except TimeoutError as err:
+        raise ConfigEntryError(f"Timed out trying to connect to client at {INDICAM_URL}") from err
     if connect_status == indicam_client.CONNECT_FAIL:
         raise ConfigEntryError(f"Connection failed trying to connect to client at {INDICAM_URL}")
     if connect_status == indicam_client.CONNECT_AUTH_FAIL:
+        _connect_ok_cache.pop(api_key, None)
         raise ConfigEntryAuthFailed("Authentication failed")
+    _connect_ok_cache[api_key] = time.monotonic()
 
 
 async def options_update_listener(hass: HomeAssistant, config_entry: ConfigEntry):
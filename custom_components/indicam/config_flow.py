@@ -1,10 +1,9 @@
 """Config flow for Indicam."""
 import os
+from pathlib import Path
 from types import MappingProxyType
 from typing import Optional, Any
 
-import aiofiles.os as aio_os
-import aiohttp
 import indicam_client
 import voluptuous as vol
 
@@ -21,6 +20,7 @@ from homeassistant.const import (
     CONF_PLATFORM, CONF_SENSORS,
 )
 from homeassistant.exceptions import ConfigEntryError, ConfigEntryAuthFailed
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers.selector import (
     NumberSelector,
     NumberSelectorConfig,
@@ -90,6 +90,16 @@ SCAN_INTERVAL_SELECTOR = NumberSelector(NumberSelectorConfig(
     unit_of_measurement='hours',
     step='any'
 ))
+# The options schema. The current option values are filled in as suggested values when the form is shown.
+OPTIONS_SCHEMA = vol.Schema(
+    {
+        # Camera configuration - mark the measurement range relative to the body of the sensor
+        vol.Required(CONF_MINIMUM): MIN_FACTOR_SELECTOR,
+        vol.Required(CONF_MAXIMUM): MAX_FACTOR_SELECTOR,
+        # Overwrite the base config scan interval to add a minimum and default
+        vol.Required(CONF_SCAN_INTERVAL): SCAN_INTERVAL_SELECTOR
+    }
+)
 
 
 class IndiCamConfigFlow(ConfigFlow, domain=DOMAIN):
@@ -101,12 +111,15 @@ class IndiCamConfigFlow(ConfigFlow, domain=DOMAIN):
 
     def __init__(self) -> None:
         """Initialize the input data store."""
-        self.data: dict[str: str] = {}
+        self.data: dict[str, Any] = {}
 
     async def async_step_user(self, user_input=None):
         """ Handle a flow initiated by the user. """
         errors: dict[str, str] = {}
         if user_input is not None:
+            # Abort before validating, so a duplicate setup does not hit the service or the file system
+            await self.async_set_unique_id(DOMAIN)
+            self._abort_if_unique_id_configured()
             try:
                 await self.user_step_input_is_valid(user_input)
             except ConfigEntryError:
@@ -118,8 +131,6 @@ class IndiCamConfigFlow(ConfigFlow, domain=DOMAIN):
             except ValueError as e:
                 errors["base"] = e.args[0]
             else:
-                await self.async_set_unique_id(DOMAIN)
-                self._abort_if_unique_id_configured()
                 self.data = user_input
                 self.data[CONF_SENSORS] = []
                 return await self.async_step_sensor()
@@ -132,20 +143,30 @@ class IndiCamConfigFlow(ConfigFlow, domain=DOMAIN):
                 - Tries to connect to the service given the auth token
                 - If a local image storage location is given, verify that it is writeable
         """
-        async with aiohttp.ClientSession() as session:
-            client = indicam_client.IndiCamServiceClient(session, INDICAM_URL, user_input[CONF_CLIENT_API_KEY])
-            await test_client_connect(client)
+        session = async_get_clientsession(self.hass)
+        client = indicam_client.IndiCamServiceClient(session, INDICAM_URL, user_input[CONF_CLIENT_API_KEY])
+        await test_client_connect(client, user_input[CONF_CLIENT_API_KEY])
         conf_path = user_input[CONF_PATH_OUT]
         if conf_path:
-            allowed_match: Optional[str] = None
-            for path in self.hass.config.allowlist_external_dirs:
-                if conf_path.startswith(path):
-                    allowed_match = path
-                    break
-            if not allowed_match:
-                raise ValueError("not_allowed")
-            if not await aio_os.access(allowed_match, os.R_OK | os.W_OK):
-                raise PermissionError
+            await self.hass.async_add_executor_job(self.check_output_path, conf_path)
+
+    def check_output_path(self, conf_path: str) -> None:
+        """ Check that the output path is inside an allowlisted directory, and that the directory is accessible.
+
+            Symbolic links and ".." components are resolved before the path is matched against the allowlist.
+            The access check is made on the closest allowlisted directory containing the path. Resolving the path
+            touches the file system, so run this in the executor.
+        """
+        if not self.hass.config.is_allowed_path(conf_path):
+            raise ValueError("not_allowed")
+        resolved = Path(conf_path).resolve()
+        allowed_match: Optional[str] = max(
+            (path for path in self.hass.config.allowlist_external_dirs if resolved.is_relative_to(path)),
+            key=len,
+            default=None,
+        )
+        if not allowed_match or not os.access(allowed_match, os.R_OK | os.W_OK):
+            raise PermissionError
 
     async def async_step_sensor(self, user_input=None):
         """ Allow the user to define a sensor.
@@ -159,17 +180,19 @@ class IndiCamConfigFlow(ConfigFlow, domain=DOMAIN):
             except ValueError:
                 errors["base"] = "unknown_service_device"
             else:
+                service_device = user_input[CONF_SERVICE_DEVICE]
                 self.data[CONF_SENSORS].append({
                     CONF_PLATFORM: DOMAIN,
                     CONF_SENSOR_TYPE: SensorType.VERTICAL_FLOAT.value,
                     CONF_NAME: user_input[CONF_NAME],
-                    CONF_SERVICE_DEVICE: user_input[CONF_SERVICE_DEVICE],
+                    CONF_SERVICE_DEVICE: service_device,
                     CONF_CAMERA_ENTITY_ID: user_input[CONF_CAMERA_ENTITY_ID],
-                    CONF_FLASH_ENTITY_ID: user_input[CONF_FLASH_ENTITY_ID],
+                    # The flash is optional, so may be missing from the input
+                    CONF_FLASH_ENTITY_ID: user_input.get(CONF_FLASH_ENTITY_ID),
                 })
                 # These are defaults for options
                 options = {
-                    user_input[CONF_SERVICE_DEVICE]: {
+                    service_device: {
                         CONF_MINIMUM: 0,
                         CONF_MAXIMUM: 0,
                         CONF_SCAN_INTERVAL: VERTICAL_FLOAT_DEFAULT_SCAN_HOURS
@@ -183,10 +206,10 @@ class IndiCamConfigFlow(ConfigFlow, domain=DOMAIN):
 
             Queries for the existence of the device at the service.
         """
-        async with aiohttp.ClientSession() as session:
-            client = indicam_client.IndiCamServiceClient(session, INDICAM_URL, self.data[CONF_CLIENT_API_KEY])
-            if await client.get_indicam_id(user_input[CONF_SERVICE_DEVICE]) is None:
-                raise ValueError("Unknown service device")
+        session = async_get_clientsession(self.hass)
+        client = indicam_client.IndiCamServiceClient(session, INDICAM_URL, self.data[CONF_CLIENT_API_KEY])
+        if await client.get_indicam_id(user_input[CONF_SERVICE_DEVICE]) is None:
+            raise ValueError("Unknown service device")
         return True
 
     @staticmethod
@@ -206,25 +229,16 @@ class IndiCamOptionsFlow(OptionsFlowWithConfigEntry):
         """
         errors: [str, Any] = None
         if user_input is not None:
-            data = {key: value for key, value in self.config_entry.data.items()}
             service_name = self.config_entry.data[CONF_SENSORS][0][CONF_SERVICE_DEVICE]
-            data[service_name] = self.user_data_to_options(user_input)
+            data = {**self.config_entry.data, service_name: self.user_data_to_options(user_input)}
             return self.async_create_entry(title="", data=data)
         return self.async_show_form(step_id="init", data_schema=self.options_schema(), errors=errors)
 
     def options_schema(self) -> vol.Schema:
-        """ Create the options schema with defaults from the current entry. """
+        """ Return the options schema with the current entry values as suggestions. """
         service_device: str = self.config_entry.data[CONF_SENSORS][0][CONF_SERVICE_DEVICE]
         user_data = self.options_to_user_data(self.config_entry.options[service_device])
-        return vol.Schema(
-            {
-                # Camera configuration - mark the measurement range relative to the body of the sensor
-                vol.Optional(CONF_MINIMUM, default=user_data[CONF_MINIMUM]): MIN_FACTOR_SELECTOR,
-                vol.Optional(CONF_MAXIMUM, default=user_data[CONF_MAXIMUM]): MAX_FACTOR_SELECTOR,
-                # Overwrite the base config scan interval to add a minimum and default
-                vol.Optional(CONF_SCAN_INTERVAL, default=user_data[CONF_SCAN_INTERVAL]): SCAN_INTERVAL_SELECTOR
-            }
-        )
+        return self.add_suggested_values_to_schema(OPTIONS_SCHEMA, user_data)
 
     @staticmethod
     def options_to_user_data(options: MappingProxyType[str, Any]) -> dict[str, Any]:
@@ -232,9 +246,9 @@ class IndiCamOptionsFlow(OptionsFlowWithConfigEntry):
             (factor offsets). Limit percentage to 2 decimals (or factor to 4) to avoid rounding issues.
         """
         return {
-            CONF_MINIMUM: round(options.get(CONF_MINIMUM) * 100, 2),
-            CONF_MAXIMUM: round(options.get(CONF_MAXIMUM) * 100, 2),
-            CONF_SCAN_INTERVAL: options.get(CONF_SCAN_INTERVAL)
+            CONF_MINIMUM: round(options[CONF_MINIMUM] * 100, 2),
+            CONF_MAXIMUM: round(options[CONF_MAXIMUM] * 100, 2),
+            CONF_SCAN_INTERVAL: options[CONF_SCAN_INTERVAL]
         }
 
     @staticmethod
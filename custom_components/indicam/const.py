@@ -10,18 +10,37 @@ FLASH_DELAY_SECONDS = 60
 # Measurement event
 INDICAM_MEASUREMENT = "image_processing.indicam_measurement"
 # Indicam service base URL
-INDICAM_URL = os.environ.get("INDICAM_URL", "https://app.hausnet.io/indicam/api")
+INDICAM_URL = os.environ.get("INDICAM_URL") or "https://app.hausnet.io/indicam/api"
+# Seconds to wait for the service to answer a connection test
+CONNECT_TIMEOUT = 10
+# Seconds for which a successful connection test for an API key is trusted without re-testing
+CONNECT_OK_CACHE_SECONDS = 300
 # For oil camera, scan time in seconds - default cycle time = 24 hours, Minimum = 4 hours
 VERTICAL_FLOAT_DEFAULT_SCAN_HOURS = 12
-VERTICAL_FLOAT_MIN_SCAN_HOURS = float(os.environ.get('INDICAM_MIN_SCAN', 4))
+try:
+    VERTICAL_FLOAT_MIN_SCAN_HOURS = float(os.environ.get('INDICAM_MIN_SCAN', 4))
+except ValueError as err:
+    raise ValueError(f"INDICAM_MIN_SCAN must be a number of hours, not '{os.environ['INDICAM_MIN_SCAN']}'") from err
 VERTICAL_FLOAT_MAX_SCAN_HOURS = 24
-# How many times, and for how long to wait for a measurement to be made
-MEASUREMENT_PROCESS_DELAYS = [1, 5, 25, 60, 90]
+# How many times, and for how long to wait for a measurement to be made. Starts short, to catch fast measurements
+# early, then backs off exponentially. Totals about the same overall wait as before (~3 minutes).
+MEASUREMENT_PROCESS_DELAYS = [0.5, 1, 2, 4, 8, 16, 30, 30, 30, 30, 30]
+# Each poll delay is randomly scaled by up to this fraction either way, so sensors scanning together spread out
+MEASUREMENT_POLL_JITTER = 0.2
+# Attempts for service calls that fail transiently, with a jittered exponential backoff between them
+SERVICE_CALL_ATTEMPTS = 4
+SERVICE_RETRY_BASE_SECONDS = 0.5
+SERVICE_RETRY_MAX_SECONDS = 8
+# Maximum number of images being measured at the service at the same time, across all sensors
+MAX_CONCURRENT_MEASUREMENTS = 8
 # Number of times to retry image capture
 IMAGE_GET_RETRIES = 3
 # Timeout for grabbing images
 GRAB_TIMEOUT = 10
 
+# JPEG quality for the saved, decorated measurement image (Pillow's default)
+DECORATED_JPEG_QUALITY = 75
+
 # Attributes
 ATTR_GAUGE_MEASUREMENT = "gauge_measurement"
 ATTR_MATCHES = "matches"
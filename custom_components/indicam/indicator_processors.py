@@ -1,29 +1,54 @@
 """Indicator Processors"""
 
 import asyncio
+import contextlib
 import io
 import logging
 import os
+import random
 import time
-from typing import Optional
+from collections.abc import Awaitable, Callable
+from typing import Optional, TypeVar
 
-import aiofiles
-import aiofiles.os
+import aiohttp
 import indicam_client
 from PIL import Image, ImageDraw
 
 from homeassistant.const import SERVICE_TURN_ON, SERVICE_TURN_OFF, ATTR_ENTITY_ID, STATE_ON
 from homeassistant.components import camera
 from homeassistant.components.switch import DOMAIN as DOMAIN_SWITCH
-from homeassistant.core import HomeAssistant
+from homeassistant.core import Event, EventStateChangedData, HomeAssistant, callback
 from homeassistant.exceptions import HomeAssistantError
-from homeassistant.util.pil import draw_box
-
-from .const import FLASH_DELAY_SECONDS, MEASUREMENT_PROCESS_DELAYS, IMAGE_GET_RETRIES, GRAB_TIMEOUT
+from homeassistant.helpers.event import async_track_state_change_event
+
+from .const import (
+    DECORATED_JPEG_QUALITY,
+    FLASH_DELAY_SECONDS,
+    MEASUREMENT_PROCESS_DELAYS,
+    MEASUREMENT_POLL_JITTER,
+    IMAGE_GET_RETRIES,
+    GRAB_TIMEOUT,
+    SERVICE_CALL_ATTEMPTS,
+    SERVICE_RETRY_BASE_SECONDS,
+    SERVICE_RETRY_MAX_SECONDS,
+)
 
 # The logger
 _LOGGER = logging.getLogger(__name__)
 
+_T = TypeVar("_T")
+
+# Errors worth retrying a read-only service call on
+_TRANSIENT_ERRORS = (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+# Errors raised while connecting, before a request reaches the service, so retrying cannot duplicate a POST
+_NOT_SENT_ERRORS = (aiohttp.ClientConnectorError,)
+
+# Decoration colors, the width of the measurement lines and scale marks, and the width of the gauge body outline
+_YELLOW = (255, 255, 0)
+_RED = (255, 0, 0)
+_LINE_WIDTH = 10
+_BODY_LINE_WIDTH = 3
+
 
 class HausNetServiceError(Exception):
     """An exception for client exceptions."""
@@ -63,6 +88,8 @@ class ImageGrabber:
                 _LOGGER.warning(
                     "Error number %d on receive image from entity: %s", get_count, err
                 )
+            if camera_image:
+                break
             get_count += 1
         await self._turn_flash_on(False)
         if not camera_image:
@@ -73,40 +100,51 @@ class ImageGrabber:
     async def _turn_flash_on(self, on: bool) -> bool:
         """Control the flash, if present.
 
-        Turn flash on (on=True) or off (on=False). Waits for the flash state
-        to change to "on" while sleeping for a period of FLASH_DELAY_SECONDS seconds.
+        Turn flash on (on=True) or off (on=False). When turning it on, waits up to FLASH_DELAY_SECONDS seconds
+        for the flash state to change to "on", reacting to the state change as soon as it happens.
 
         If, at the end, the flash has not yet been turned on, return False,
         otherwise return True.
         """
         if not self._flash_entity_id:
             return True
-        await self._hass.services.async_call(
-            DOMAIN_SWITCH,
-            SERVICE_TURN_ON if on else SERVICE_TURN_OFF,
-            {ATTR_ENTITY_ID: self._flash_entity_id},
-            blocking=True,
-        )
         if not on:
+            await self._hass.services.async_call(
+                DOMAIN_SWITCH, SERVICE_TURN_OFF, {ATTR_ENTITY_ID: self._flash_entity_id}, blocking=True
+            )
             _LOGGER.debug("Flash turned off")
             return True
-        _LOGGER.debug("Waiting for flash to turn on")
-        wait_seconds = 0
-        while wait_seconds < FLASH_DELAY_SECONDS:
+        flash_on = asyncio.Event()
+
+        @callback
+        def _flash_state_changed(event: Event[EventStateChangedData]) -> None:
+            """Signal the waiter when the flash reports that it is on."""
+            new_state = event.data["new_state"]
+            if new_state is not None and new_state.state == STATE_ON:
+                flash_on.set()
+
+        unsubscribe = async_track_state_change_event(self._hass, [self._flash_entity_id], _flash_state_changed)
+        try:
+            await self._hass.services.async_call(
+                DOMAIN_SWITCH, SERVICE_TURN_ON, {ATTR_ENTITY_ID: self._flash_entity_id}, blocking=True
+            )
             flash_state = self._hass.states.get(self._flash_entity_id)
             if not flash_state:
                 return False
-            _LOGGER.debug(
-                "Flash state is %s, %d seconds passed", flash_state.state, wait_seconds
-            )
+            # The state may have changed before or during the service call
             if flash_state.state == STATE_ON:
-                break
-            await asyncio.sleep(1)
-            wait_seconds += 1
-        if wait_seconds > FLASH_DELAY_SECONDS:
-            _LOGGER.error("Flash did not turn on after %d seconds", wait_seconds)
-            return False
-        _LOGGER.info("Flash turned on after %d seconds", wait_seconds)
+                flash_on.set()
+            _LOGGER.debug("Waiting for flash to turn on")
+            started = time.monotonic()
+            try:
+                async with asyncio.timeout(FLASH_DELAY_SECONDS):
+                    await flash_on.wait()
+            except TimeoutError:
+                _LOGGER.error("Flash did not turn on after %d seconds", FLASH_DELAY_SECONDS)
+                return False
+        finally:
+            unsubscribe()
+        _LOGGER.debug("Flash turned on after %.1f seconds", time.monotonic() - started)
         return True
 
 
@@ -133,6 +171,7 @@ class VerticalFloatProcessor(IndicatorProcessor):
         client: indicam_client.IndiCamServiceClient,
         device_name: str,
         camconfig: indicam_client.CamConfig,
+        measurement_limiter: asyncio.Semaphore,
     ) -> None:
         """Set up the service URL and call headers."""
         self.cam_config = camconfig
@@ -141,6 +180,7 @@ class VerticalFloatProcessor(IndicatorProcessor):
         self._api_client: indicam_client.IndiCamServiceClient = client
         self._updated_cam_config: bool = False
         self._indicam_id: int | None = None
+        self._measurement_limiter = measurement_limiter
 
     async def process_img(
         self, image: bytes
@@ -150,28 +190,39 @@ class VerticalFloatProcessor(IndicatorProcessor):
         First, updates the service camera configuration if it has not
         yet been done. Then, process the image using the service, and
         fetch the measurement results. Returns the measurement results and
-        the elapsed time.
+        the elapsed time. The number of images in flight at the service is
+        bounded by the measurement limiter shared by all the processors.
         """
         start = time.monotonic()
         if not self._updated_cam_config:
             await self._update_cam_config()
-        image_id = await self._api_client.upload_image(self.device_name, image)
+        async with self._measurement_limiter:
+            measurement = await self._measure(image)
+        return measurement, time.monotonic() - start
+
+    async def _measure(self, image: bytes) -> indicam_client.GaugeMeasurement | None:
+        """Upload the image, then poll the service until its measurement is ready."""
+        image_id = await self._call_with_retries(
+            self._api_client.upload_image, self.device_name, image, idempotent=False
+        )
         if not image_id:
             _LOGGER.error("Image upload failed, no image ID returned")
-            return None, time.monotonic() - start
-        for delay in MEASUREMENT_PROCESS_DELAYS:
-            if not await self._api_client.measurement_ready(image_id):
-                await asyncio.sleep(delay)
-                continue
-            measurement = await self._api_client.get_measurement(image_id)
-            if not measurement:
-                break
-            return measurement, time.monotonic() - start
-        _LOGGER.error(
-            "Timed out waiting to retrieve measurement results for: image_id=%d",
-            image_id
-        )
-        return None, time.monotonic() - start
+            return None
+        # Readiness is checked once more after the last delay, so the final wait is not wasted
+        delays = iter(MEASUREMENT_PROCESS_DELAYS)
+        while not await self._api_client.measurement_ready(image_id):
+            delay = next(delays, None)
+            if delay is None:
+                _LOGGER.error(
+                    "Timed out waiting to retrieve measurement results for: image_id=%d",
+                    image_id
+                )
+                return None
+            await asyncio.sleep(delay * random.uniform(1 - MEASUREMENT_POLL_JITTER, 1 + MEASUREMENT_POLL_JITTER))
+        measurement = await self._call_with_retries(self._api_client.get_measurement, image_id)
+        if not measurement:
+            _LOGGER.error("Could not retrieve the measurement results for: image_id=%d", image_id)
+        return measurement
 
     async def _update_cam_config(self):
         """Update the camera config at the service if needed.
@@ -186,10 +237,11 @@ class VerticalFloatProcessor(IndicatorProcessor):
         """
         if self._updated_cam_config:
             return
-        _LOGGER.debug(
-            "Fetching service camconfig for indicam ID=%d", await self._get_indicam_id()
-        )
-        svc_cfg = await self._api_client.get_camconfig(await self._get_indicam_id())
+        indicam_id = await self._get_indicam_id()
+        if indicam_id is None:
+            raise HausNetServiceError(f"Could not retrieve the indicam ID for {self.device_name} from the service")
+        _LOGGER.debug("Fetching service camconfig for indicam ID=%d", indicam_id)
+        svc_cfg = await self._call_with_retries(self._api_client.get_camconfig, indicam_id)
         if not svc_cfg:
             raise HausNetServiceError(
                 "Could not retrieve camera configuration from the service"
@@ -198,8 +250,8 @@ class VerticalFloatProcessor(IndicatorProcessor):
             _LOGGER.debug("Local cam config the same as at service")
             self._updated_cam_config = True
             return
-        cfg_created = await self._api_client.create_camconfig(
-            await self._get_indicam_id(), self.cam_config
+        cfg_created = await self._call_with_retries(
+            self._api_client.create_camconfig, indicam_id, self.cam_config, idempotent=False
         )
         if not cfg_created:
             raise HausNetServiceError(
@@ -211,17 +263,52 @@ class VerticalFloatProcessor(IndicatorProcessor):
     async def _get_indicam_id(self) -> int | None:
         """If the IndiCam ID has not yet been retrieved, get it."""
         if not self._indicam_id:
-            self._indicam_id = await self._api_client.get_indicam_id(self.device_name)
+            self._indicam_id = await self._call_with_retries(self._api_client.get_indicam_id, self.device_name)
         return self._indicam_id
 
+    @staticmethod
+    async def _call_with_retries(
+        call: Callable[..., Awaitable[_T | None]], *args, idempotent: bool = True
+    ) -> _T | None:
+        """Call a service client method, retrying with a jittered exponential backoff on failure.
+
+        The client signals failures by returning None, or by raising on connection errors and
+        timeouts. Returns None if every attempt failed. Calls that are not idempotent (the POSTs)
+        are only retried when connecting failed, as otherwise the service may already have acted
+        on the request, and None results are returned as they are. Note that the client does not
+        distinguish authentication failures, so those are retried too - the attempts are bounded, though.
+        """
+        retry_errors = _TRANSIENT_ERRORS if idempotent else _NOT_SENT_ERRORS
+        for attempt in range(1, SERVICE_CALL_ATTEMPTS + 1):
+            try:
+                result = await call(*args)
+            except retry_errors as err:
+                _LOGGER.warning("Service call attempt %d failed: %s", attempt, err)
+                result = None
+            else:
+                if result is not None or not idempotent:
+                    return result
+            if attempt < SERVICE_CALL_ATTEMPTS:
+                backoff = min(SERVICE_RETRY_MAX_SECONDS, SERVICE_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+                await asyncio.sleep(random.uniform(0, backoff))
+        return None
+
 
 class VerticalFloatDecorator(IndicatorDecorator):
     """Saves a snapshot of the original image, and decorates an image based on the measurement."""
 
-    def __init__(self, file_path: str, file_prefix: str):
+    def __init__(self, hass: HomeAssistant, file_path: str, file_prefix: str):
         """Store configuration values."""
+        self._hass = hass
         self._file_path = file_path
         self._file_prefix = file_prefix
+        # Set once the output directory is known to exist, to avoid re-creating it on every save
+        self._outdir_ready = False
+
+    @property
+    def enabled(self) -> bool:
+        """Whether an output location is configured, i.e. whether there is anything to save."""
+        return bool(self._file_path)
 
     async def decorate_and_save(
             self,
@@ -229,16 +316,42 @@ class VerticalFloatDecorator(IndicatorDecorator):
             result: indicam_client.GaugeMeasurement,
             cam_config: indicam_client.CamConfig
     ) -> None:
-        """Saves the snapshot and decorated result image in the configured location."""
-        if not self._file_path:
+        """Saves the snapshot and decorated result image in the configured location.
+
+        The two files are independent, so the snapshot is written while the result image is being decorated.
+        """
+        if not self.enabled:
             return
         snap_file_path = f"{self._file_path}/{self._file_prefix}-snapshot.jpg"
-        await self.save_image(image, snap_file_path)
         msr_file_path = f"{self._file_path}/{self._file_prefix}-measure.jpg"
+        await asyncio.gather(
+            self.save_image(image, snap_file_path),
+            self._decorate_and_save_measure(image, result, cam_config, msr_file_path),
+        )
+
+    async def _decorate_and_save_measure(
+            self,
+            image: bytes,
+            result: indicam_client.GaugeMeasurement,
+            cam_config: indicam_client.CamConfig,
+            path: str
+    ) -> None:
+        """Saves the decorated result image, or removes a stale one if there is no result."""
         if not result:
-            await self.save_image(None, msr_file_path)
+            await self.save_image(None, path)
             return
-        await self.save_image(self.decorate_image(image, result, cam_config), msr_file_path)
+        # Decoding, drawing and encoding are CPU-bound, so keep them off the event loop
+        decorated = await self._hass.async_add_executor_job(self.encode_decorated, image, result, cam_config)
+        await self.save_image(decorated, path)
+
+    def encode_decorated(
+        self, image: bytes, result: indicam_client.GaugeMeasurement, cam_config: indicam_client.CamConfig
+    ) -> bytes:
+        """Decorate the image, and return it encoded as a JPEG. Blocking, so run it in the executor."""
+        buffer = io.BytesIO()
+        with self.decorate_image(image, result, cam_config) as decorated:
+            decorated.save(buffer, "JPEG", quality=DECORATED_JPEG_QUALITY)
+        return buffer.getvalue()
 
     def decorate_image(
         self, image: bytes, result: indicam_client.GaugeMeasurement, cam_config: indicam_client.CamConfig
@@ -246,46 +359,60 @@ class VerticalFloatDecorator(IndicatorDecorator):
         """Decorate the image with extracted data.
 
         Draw lines on the image showing the scale, camera configuration,
-        and measurements.
+        and measurements. The caller owns, and should close, the returned image.
         """
-        img = Image.open(io.BytesIO(bytearray(image))).convert("RGB")
-        img_width, img_height = img.size
+        with Image.open(io.BytesIO(image)) as source:
+            img = source.convert("RGB")
         draw = ImageDraw.Draw(img)
-        self._draw_body(draw, img_height, img_width, result)
+        self._draw_body(draw, result)
         self._draw_scale(draw, result)
         self._draw_min_max(draw, result, cam_config)
         self._draw_float_line(draw, result)
         return img
 
+    async def save_image(self, image: bytes | None, path: str) -> None:
+        """Saves encoded image bytes in the given location. If the image is 'None', deletes the file instead.
+
+        The directory is created on the first save, and again if it has since disappeared.
+        """
+        _LOGGER.debug("Saving results image to %s", path)
+        await self._hass.async_add_executor_job(self._write_image, image, path, not self._outdir_ready)
+        self._outdir_ready = True
+
     @staticmethod
-    async def save_image(image: Image.Image | bytes | None, path: str) -> None:
-        """Saves an image in the given location. If the image is 'None', deletes the file instead."""
-        _LOGGER.info("Saving results image to %s", path)
-        await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+    def _write_image(image: bytes | None, path: str, make_dir: bool) -> None:
+        """Write, or for a 'None' image remove, the image file. Blocking, so run it in the executor."""
+        if make_dir:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
         if image is None:
-            await aiofiles.os.remove(path)
-        if isinstance(image, bytes):
-            buffer = io.BytesIO(bytearray(image))
-        else:
-            buffer = io.BytesIO()
-            image.save(buffer, "JPEG")
-        async with aiofiles.open(path, "wb") as file:
-            await file.write(buffer.getbuffer())
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            return
+        # Write to a sibling and swap it in, so a reader never sees a partly written image
+        tmp_path = f"{path}.tmp"
+        try:
+            VerticalFloatDecorator._write_file(tmp_path, image)
+            os.replace(tmp_path, path)
+        except OSError:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp_path)
+            raise
 
     @staticmethod
-    def _draw_body(
-        draw: ImageDraw.ImageDraw,
-        img_height: int,
-        img_width: int,
-        msr: indicam_client.GaugeMeasurement,
-    ) -> None:
+    def _write_file(path: str, data: bytes) -> None:
+        """Write the data to the file, re-creating the directory once if it has disappeared since it was made."""
+        try:
+            file = open(path, "wb")
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            file = open(path, "wb")
+        with file:
+            file.write(data)
+
+    @staticmethod
+    def _draw_body(draw: ImageDraw.ImageDraw, msr: indicam_client.GaugeMeasurement) -> None:
         """Draw the (estimated) borders of the gauge body. Drawn in yellow."""
-        top = msr.body_top / img_height
-        left = msr.body_left / img_width
-        bottom = msr.body_bottom / img_height
-        right = msr.body_right / img_width
-        box = (top, left, bottom, right)
-        draw_box(draw, box, img_width, img_height, color=(255, 255, 0))
+        draw.rectangle((msr.body_left, msr.body_top, msr.body_right, msr.body_bottom), outline=_YELLOW, width=_BODY_LINE_WIDTH)
 
     @staticmethod
     def _draw_scale(
@@ -299,10 +426,14 @@ class VerticalFloatDecorator(IndicatorDecorator):
         height = msr.body_bottom - msr.body_top + 1
         width = msr.body_right - msr.body_left + 1
         mark_width = 0.1 * width
-        for perc_mark in range(0, 101, 10):
-            mark_loc = round(msr.body_top + height * perc_mark / 100)
-            line = [(msr.body_left - mark_width, mark_loc), (msr.body_left, mark_loc)]
-            draw.line(line, width=10, fill=(255, 255, 0))
+        mark_locs = [round(msr.body_top + height * perc_mark / 100) for perc_mark in range(0, 101, 10)]
+        # A filled rectangle per mark is cheaper for PIL than stroking a thick line, and looks the same: it spans
+        # _LINE_WIDTH rows around the mark's row, as a line of that width would
+        mark_above = _LINE_WIDTH // 2
+        mark_below = _LINE_WIDTH - mark_above - 1
+        for mark_loc in mark_locs:
+            mark = [(msr.body_left - mark_width, mark_loc - mark_above), (msr.body_left, mark_loc + mark_below)]
+            draw.rectangle(mark, fill=_YELLOW)
 
     @staticmethod
     def _draw_min_max(
@@ -320,13 +451,13 @@ class VerticalFloatDecorator(IndicatorDecorator):
         min_row = msr.body_bottom - cam_conf.min_perc * height
         draw.line(
             [(msr.body_left, max_row), (msr.body_right, max_row)],
-            width=10,
-            fill=(255, 0, 0),
+            width=_LINE_WIDTH,
+            fill=_RED,
         )
         draw.line(
             [(msr.body_left, min_row), (msr.body_right, min_row)],
-            width=10,
-            fill=(255, 0, 0),
+            width=_LINE_WIDTH,
+            fill=_RED,
         )
 
     @staticmethod
@@ -339,4 +470,4 @@ class VerticalFloatDecorator(IndicatorDecorator):
         Drawn in red.
         """
         line = [(msr.body_left, msr.float_top), (msr.body_right, msr.float_top)]
-        draw.line(line, width=10, fill=(255, 0, 0))
+        draw.line(line, width=_LINE_WIDTH, fill=_RED)
@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 import datetime as dt
-from collections.abc import Mapping
+import hashlib
 import logging
 from enum import StrEnum
 from typing import Any
@@ -24,6 +24,8 @@ from homeassistant.const import (
 )
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.start import async_at_started
 
 from .indicator_processors import VerticalFloatProcessor, VerticalFloatDecorator, ImageGrabber
 from . import IndiCamComponentState
@@ -47,6 +49,7 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_e
 
         Note: Allows for many sensors, but only one can be configured for now.
     """
+    component_state: IndiCamComponentState = entry.runtime_data
     entities: list[IndiCamSensorEntity] = []
     for sensor_conf in entry.data[CONF_SENSORS]:
         if CONF_SENSOR_TYPE not in sensor_conf or sensor_conf[CONF_SENSOR_TYPE] != SensorType.VERTICAL_FLOAT.value:
@@ -54,14 +57,15 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_e
         name = sensor_conf[CONF_NAME]
         service_device = sensor_conf[CONF_SERVICE_DEVICE]
         camera_entity_id = sensor_conf[CONF_CAMERA_ENTITY_ID]
-        sensor_options = entry.options[sensor_conf[CONF_SERVICE_DEVICE]]
+        sensor_options = entry.options[service_device]
         cam_config = indicam_client.CamConfig(
             min_perc=sensor_options.get(CONF_MINIMUM), max_perc=sensor_options.get(CONF_MAXIMUM)
         )
         flash_entity_id = sensor_conf[CONF_FLASH_ENTITY_ID]
-        component_state: IndiCamComponentState = entry.runtime_data
-        processor = VerticalFloatProcessor(hass, entry.runtime_data.api_client, service_device, cam_config)
-        decorator = VerticalFloatDecorator(component_state.out_path, service_device)
+        processor = VerticalFloatProcessor(
+            hass, component_state.api_client, service_device, cam_config, component_state.measurement_limiter
+        )
+        decorator = VerticalFloatDecorator(hass, component_state.out_path, service_device)
         grabber = ImageGrabber(hass, camera_entity_id, flash_entity_id)
         entity = IndiCamSensorEntity(name, sensor_options[CONF_SCAN_INTERVAL], grabber, processor, decorator)
         entities.append(entity)
@@ -71,6 +75,9 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_e
 class IndiCamSensorEntity(SensorEntity):
     """ An entity representing a measurement extraction service operating on a camera. """
 
+    # Measurements are hours apart, so they are scheduled at the scan interval rather than polled
+    _attr_should_poll = False
+
     def __init__(
             self,
             name: str,
@@ -86,7 +93,13 @@ class IndiCamSensorEntity(SensorEntity):
         self._processor = processor
         self._decorator = decorator
         self._last_result: indicam_client.GaugeMeasurement | None = None
-        self._last_time: dt.datetime | None = None
+        self._attr_extra_state_attributes = {ATTR_GAUGE_MEASUREMENT: None}
+        # Digest of the image behind the last successful measurement, to skip re-measuring an unchanged image
+        self._last_image_hash: bytes | None = None
+        # Whether the last capture and measurement attempts failed, so failures are logged when they start rather
+        # than every scan
+        self._measurement_failed = False
+        self._capture_failed = False
 
     @property
     def name(self) -> str:
@@ -112,41 +125,66 @@ class IndiCamSensorEntity(SensorEntity):
         """The state class -- a measurement """
         return SensorStateClass.MEASUREMENT
 
-    @property
-    def extra_state_attributes(self) -> Mapping[str, Any] | None:
-        """Return device specific state attributes"""
-        return {ATTR_GAUGE_MEASUREMENT: self._last_result}
+    async def async_added_to_hass(self) -> None:
+        """Measure once Home Assistant has started, and then every scan interval."""
+        self.async_on_remove(async_at_started(self.hass, self._async_measure))
+        self.async_on_remove(
+            async_track_time_interval(
+                self.hass, self._async_measure, dt.timedelta(hours=self._scan_interval_hours)
+            )
+        )
 
-    @property
-    def native_value(self) -> float | None:
-        """Return the state of the sensor"""
-        if self._last_result is None:
-            return None
-        return round(self._last_result.value * 100, 1)
+    async def _async_measure(self, *_: Any) -> None:
+        """Update the entity, and publish its state."""
+        await self.async_update_ha_state(True)
 
     async def async_update(self) -> None:
         """ Takes and saves a snapshot image, and processes it to obtain a measurement.
             If a result was obtained, creates a decorated image showing the measurements, and saves it.
         """
-        now = dt.datetime.now()
-        if self._last_time is None:
-            next_time = now
-        else:
-            next_time = self._last_time + dt. timedelta(hours=self._scan_interval_hours)
-        if now < next_time:
-            return
-        self._last_time = now
-        _LOGGER.info("Grabbing vertical float snapshot image")
+        _LOGGER.debug("Grabbing vertical float snapshot image")
         image: bytes = await self._grabber.grab_image()
         if not image:
-            _LOGGER.error("No image captured, skipping processing step")
+            if not self._capture_failed:
+                _LOGGER.error("No image captured, skipping processing step")
+            else:
+                _LOGGER.debug("Still no image captured, skipping processing step")
+            self._capture_failed = True
+            return
+        if self._capture_failed:
+            _LOGGER.warning("Image capture recovered")
+            self._capture_failed = False
+        image_hash = hashlib.sha256(image).digest()
+        if image_hash == self._last_image_hash:
+            _LOGGER.debug("Image unchanged since the last measurement, skipping processing step")
             return
         measurement, elapsed = await self._processor.process_img(image)
-        _LOGGER.info("Image processing time: %f", elapsed)
+        _LOGGER.debug("Image processing time: %f", elapsed)
         failed = not measurement or not measurement.value
         if failed:
-            _LOGGER.error("Measurement extraction failed, keeping last measurement as state")
+            if not self._measurement_failed:
+                _LOGGER.error("Measurement extraction failed, keeping last measurement as state")
+            else:
+                _LOGGER.debug("Measurement extraction still failing")
+            self._measurement_failed = True
             return
+        if self._measurement_failed:
+            _LOGGER.warning("Measurement extraction recovered")
+            self._measurement_failed = False
         self._last_result = measurement
-        # Save the decorated image showing the measurements
-        await self._decorator.decorate_and_save(image, self._last_result, self._processor.cam_config)
+        self._attr_native_value = round(measurement.value * 100, 1)
+        self._attr_extra_state_attributes = {ATTR_GAUGE_MEASUREMENT: measurement}
+        self._last_image_hash = image_hash
+        # Save the decorated image showing the measurements, if there is somewhere to save it. The state does not
+        # depend on the saved images, so it is published without waiting for them.
+        if self._decorator.enabled:
+            self.hass.async_create_background_task(
+                self._async_save_images(image, measurement), f"{DOMAIN} save images {self._processor.device_name}"
+            )
+
+    async def _async_save_images(self, image: bytes, measurement: indicam_client.GaugeMeasurement) -> None:
+        """Save the snapshot and decorated images, logging a failure rather than raising it."""
+        try:
+            await self._decorator.decorate_and_save(image, measurement, self._processor.cam_config)
+        except OSError as err:
+            _LOGGER.error("Could not save the measurement images: %s", err)
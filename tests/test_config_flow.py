@@ -0,0 +1,52 @@
+"""Config flow tests."""
+
+from pathlib import Path
+
+import pytest
+
+from custom_components.indicam.config_flow import IndiCamConfigFlow
+from homeassistant.core import HomeAssistant
+
+
+@pytest.fixture
+def allowed_dir(hass: HomeAssistant, tmp_path: Path) -> Path:
+    """Create a directory, and make it the only allowlisted external directory."""
+    allowed = tmp_path / "indicam"
+    allowed.mkdir()
+    hass.config.allowlist_external_dirs = {str(allowed)}
+    return allowed
+
+
+@pytest.fixture
+def flow(hass: HomeAssistant) -> IndiCamConfigFlow:
+    """A config flow attached to the test instance."""
+    config_flow = IndiCamConfigFlow()
+    config_flow.hass = hass
+    return config_flow
+
+
+async def test_output_path_inside_allowed_dir(hass: HomeAssistant, flow, allowed_dir: Path) -> None:
+    """A path inside the allowlisted directory, even one not yet created, is accepted."""
+    await hass.async_add_executor_job(flow.check_output_path, str(allowed_dir / "out"))
+
+
+async def test_output_path_sharing_prefix_rejected(hass: HomeAssistant, flow, allowed_dir: Path) -> None:
+    """A sibling whose name merely starts with the allowlisted directory's name is rejected."""
+    with pytest.raises(ValueError, match="not_allowed"):
+        await hass.async_add_executor_job(flow.check_output_path, f"{allowed_dir}2")
+
+
+async def test_output_path_escaping_with_dot_dot_rejected(hass: HomeAssistant, flow, allowed_dir: Path) -> None:
+    """A path climbing out of the allowlisted directory with '..' is rejected."""
+    (allowed_dir.parent / "other").mkdir()
+    with pytest.raises(ValueError, match="not_allowed"):
+        await hass.async_add_executor_job(flow.check_output_path, str(allowed_dir / ".." / "other"))
+
+
+async def test_output_path_symlink_out_rejected(hass: HomeAssistant, flow, allowed_dir: Path) -> None:
+    """A symbolic link inside the allowlisted directory pointing outside of it is rejected."""
+    outside = allowed_dir.parent / "outside"
+    outside.mkdir()
+    (allowed_dir / "link").symlink_to(outside)
+    with pytest.raises(ValueError, match="not_allowed"):
+        await hass.async_add_executor_job(flow.check_output_path, str(allowed_dir / "link"))
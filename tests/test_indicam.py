@@ -76,6 +76,10 @@ def image_for_test() -> Image.Image:
     return Image.open(filepath).convert("RGB")
 
 
+# Decoded once, and shared by the tests that have the camera return the test image
+_TEST_IMAGE = image_for_test()
+
+
 async def setup_indicam(hass):
     """Set up indicam-specific stuff.
 
@@ -115,7 +119,7 @@ async def image_processing_scan(hass) -> None:
 
 @mock.patch(
     "homeassistant.components.demo.camera.Path.read_bytes",
-    return_value=image_for_test(),
+    return_value=_TEST_IMAGE,
 )
 async def test_image_uploaded(mock_camera_read, hass: HomeAssistant) -> None:
     """Verify that a captured image is uploaded to the service for processing."""
@@ -145,7 +149,7 @@ async def test_get_image_from_camera(mock_camera_read, hass: HomeAssistant) -> N
 # Return the test image from the camera
 @mock.patch(
     "homeassistant.components.demo.camera.Path.read_bytes",
-    return_value=image_for_test(),
+    return_value=_TEST_IMAGE,
 )
 async def test_measurement_event(mock_camera_read, hass: HomeAssistant) -> None:
     """Verify that an event broadcasting the (mock) measurement is generated."""
@@ -173,7 +177,7 @@ async def test_measurement_event(mock_camera_read, hass: HomeAssistant) -> None:
 # Return the test image from the camera
 @mock.patch(
     "homeassistant.components.demo.camera.Path.read_bytes",
-    return_value=image_for_test(),
+    return_value=_TEST_IMAGE,
 )
 async def test_state(mock_camera_read, hass: HomeAssistant) -> None:
     """Verify the state makes sense after processing an image."""
@@ -189,7 +193,7 @@ async def test_state(mock_camera_read, hass: HomeAssistant) -> None:
 # Return the test image from the camera
 @mock.patch(
     "homeassistant.components.demo.camera.Path.read_bytes",
-    return_value=image_for_test(),
+    return_value=_TEST_IMAGE,
 )
 async def test_state_measurement_failed(mock_camera_read, hass: HomeAssistant) -> None:
     """Verify the state makes sense after processing an image."""
@@ -0,0 +1,53 @@
+"""Image grabber tests."""
+
+from unittest import mock
+
+from custom_components.indicam.indicator_processors import ImageGrabber
+from homeassistant.components.camera import Image
+from homeassistant.const import STATE_OFF, STATE_ON
+from homeassistant.core import HomeAssistant, ServiceCall, callback
+from homeassistant.exceptions import HomeAssistantError
+from pytest_homeassistant_custom_component.common import async_mock_service
+
+CAMERA_ENTITY_ID = "camera.test"
+FLASH_ENTITY_ID = "switch.flash"
+GET_IMAGE = "custom_components.indicam.indicator_processors.camera.async_get_image"
+
+
+async def test_grab_stops_at_first_image(hass: HomeAssistant) -> None:
+    """Once the camera returns an image, it is not asked for another."""
+    grabber = ImageGrabber(hass, CAMERA_ENTITY_ID, None)
+    with mock.patch(GET_IMAGE, return_value=Image("image/jpeg", b"image")) as get_image:
+        assert await grabber.grab_image() == b"image"
+    assert get_image.await_count == 1
+
+
+async def test_grab_retried_after_error(hass: HomeAssistant) -> None:
+    """A failed grab is retried."""
+    grabber = ImageGrabber(hass, CAMERA_ENTITY_ID, None)
+    with mock.patch(GET_IMAGE, side_effect=[HomeAssistantError("No image"), Image("image/jpeg", b"image")]) as get_image:
+        assert await grabber.grab_image() == b"image"
+    assert get_image.await_count == 2
+
+
+async def test_flash_turning_on_later_is_waited_for(hass: HomeAssistant) -> None:
+    """The flash turning on after the service call returned is picked up by the state listener."""
+    hass.states.async_set(FLASH_ENTITY_ID, STATE_OFF)
+
+    @callback
+    def turn_on(_call: ServiceCall) -> None:
+        hass.loop.call_later(0.05, hass.states.async_set, FLASH_ENTITY_ID, STATE_ON)
+
+    hass.services.async_register("switch", "turn_on", turn_on)
+    grabber = ImageGrabber(hass, CAMERA_ENTITY_ID, FLASH_ENTITY_ID)
+    assert await grabber._turn_flash_on(True)
+
+
+async def test_flash_not_turning_on_times_out(hass: HomeAssistant) -> None:
+    """A flash that never turns on is reported as a failure once the flash delay has passed."""
+    hass.states.async_set(FLASH_ENTITY_ID, STATE_OFF)
+    calls = async_mock_service(hass, "switch", "turn_on")
+    grabber = ImageGrabber(hass, CAMERA_ENTITY_ID, FLASH_ENTITY_ID)
+    with mock.patch("custom_components.indicam.indicator_processors.FLASH_DELAY_SECONDS", 0.1):
+        assert not await grabber._turn_flash_on(True)
+    assert len(calls) == 1
@@ -0,0 +1,94 @@
+"""Sensor entity tests."""
+
+from datetime import timedelta
+from unittest import mock
+
+from indicam_client import CamConfig, GaugeMeasurement
+
+from custom_components.indicam.sensor import IndiCamSensorEntity
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+SCAN_INTERVAL_HOURS = 12
+MEASUREMENT = GaugeMeasurement(
+    body_left=100,
+    body_right=200,
+    body_top=100,
+    body_bottom=500,
+    float_top=300,
+    value=0.5,
+)
+
+
+def sensor_entity(images: list[bytes | None], *results: GaugeMeasurement | None) -> IndiCamSensorEntity:
+    """Create a sensor entity whose camera returns the given images, and whose service returns the results.
+
+    Without results, every image processed is measured as MEASUREMENT. Nothing is saved.
+    """
+    grabber = mock.MagicMock()
+    grabber.grab_image = mock.AsyncMock(side_effect=images)
+    processor = mock.MagicMock()
+    processor.device_name = "test_device"
+    processor.cam_config = CamConfig(min_perc=0.1, max_perc=0.1)
+    if results:
+        processor.process_img = mock.AsyncMock(side_effect=[(result, 0.1) for result in results])
+    else:
+        processor.process_img = mock.AsyncMock(return_value=(MEASUREMENT, 0.1))
+    decorator = mock.MagicMock()
+    decorator.enabled = False
+    return IndiCamSensorEntity("indicam test", SCAN_INTERVAL_HOURS, grabber, processor, decorator)
+
+
+async def test_unchanged_image_not_measured_again() -> None:
+    """An image identical to the last measured one is not sent to the service, and the state is kept."""
+    entity = sensor_entity([b"image", b"image"])
+    await entity.async_update()
+    await entity.async_update()
+    assert entity._processor.process_img.await_count == 1
+    assert entity.native_value == 50.0
+
+
+async def test_changed_image_measured() -> None:
+    """A different image is measured."""
+    entity = sensor_entity([b"image", b"other image"])
+    await entity.async_update()
+    await entity.async_update()
+    assert entity._processor.process_img.await_count == 2
+
+
+async def test_unchanged_image_measured_after_failure() -> None:
+    """An image whose measurement failed is measured again, even if unchanged."""
+    entity = sensor_entity([b"image", b"image"], None, MEASUREMENT)
+    await entity.async_update()
+    assert entity.native_value is None
+    await entity.async_update()
+    assert entity._processor.process_img.await_count == 2
+    assert entity.native_value == 50.0
+
+
+async def test_no_image_keeps_state() -> None:
+    """When no image is captured, nothing is measured."""
+    entity = sensor_entity([None])
+    await entity.async_update()
+    entity._processor.process_img.assert_not_awaited()
+    assert entity.native_value is None
+
+
+async def test_measured_at_start_and_every_scan_interval(hass: HomeAssistant) -> None:
+    """The entity measures once added to a running instance, then every scan interval until removed."""
+    entity = sensor_entity([])
+    entity.hass = hass
+    with mock.patch.object(entity, "async_update_ha_state") as update:
+        await entity.async_added_to_hass()
+        await hass.async_block_till_done()
+        assert update.await_count == 1
+        update.assert_awaited_with(True)
+        async_fire_time_changed(hass, dt_util.utcnow() + timedelta(hours=SCAN_INTERVAL_HOURS, seconds=1))
+        await hass.async_block_till_done()
+        assert update.await_count == 2
+        # Removing the entity from Home Assistant runs these, which stops the schedule
+        entity._call_on_remove_callbacks()
+        async_fire_time_changed(hass, dt_util.utcnow() + timedelta(hours=2 * SCAN_INTERVAL_HOURS, seconds=1))
+        await hass.async_block_till_done()
+        assert update.await_count == 2